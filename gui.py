@@ -1,18 +1,30 @@
 import sys
 import os
 import json
+import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from src.converter import MarkdownConverter
+from src.converter import MarkdownConverter, IncrementalRenderer
+from src.tkdnd import add_drag_n_drop_support
+from src.extensions import CONFIG_FILE as EXTENSIONS_CONFIG_FILE
+
+# 模板子文件夹中必需的模板文件
+REQUIRED_TEMPLATES = ['top.html', 'bottom.html', 'h2.html']
+# 预览时监视的模板文件（含可选的boldcolor.txt和扩展配置）
+WATCHED_TEMPLATES = REQUIRED_TEMPLATES + ['boldcolor.txt', EXTENSIONS_CONFIG_FILE]
+# 检查文件变化的间隔（毫秒），只比较修改时间，开销很小
+PREVIEW_POLL_MS = 25
+# 文件静止这么久（毫秒）后才重新渲染，用于合并连续的保存
+PREVIEW_DEBOUNCE_MS = 50
 
 class MainWindow:
     def __init__(self, root):
         self.root = root
         self.root.title("Markdown转HTML工具")
-        self.root.geometry("900x650")  # 调整窗口大小
+        self.root.geometry("1400x700")  # 调整窗口大小
         
         # 设置窗口最小尺寸
-        self.root.minsize(900, 650)
+        self.root.minsize(1300, 650)
         
         # 配置苹果风格
         self.configure_styles()
@@ -24,9 +36,20 @@ class MainWindow:
         self.input_dir = tk.StringVar(value="未选择")
         self.output_dir = tk.StringVar(value="未选择")
         self.template_dir = tk.StringVar(value="未选择")
+        self.preview_file = tk.StringVar(value="未选择")
         
         # 初始化进度变量
         self.progress_var = tk.StringVar(value="")
+        self.preview_status = tk.StringVar(value="")
+        
+        # 预览状态：渲染器、监视的文件修改时间、防抖定时器
+        self.preview_renderer = None
+        self.preview_template_dir = None
+        self.preview_mtimes = {}
+        self.preview_job = None
+        # 轮询时最近一次看到的 (模板目录, 修改时间)，以及模板父目录的解析缓存
+        self.preview_observed = None
+        self.poll_template = (None, None)
         
         # 加载上次的配置
         self.load_config()
@@ -34,6 +57,13 @@ class MainWindow:
         # 创建主界面
         self.init_ui()
         
+        # 启用拖放：拖入文件用于预览，拖入文件夹作为输入目录
+        for widget in (self.root, self.log_text, self.preview_text):
+            add_drag_n_drop_support(widget, self.on_drop)
+        
+        # 开始监视预览文件和模板的变化
+        self.root.after(PREVIEW_POLL_MS, self.poll_preview_sources)
+        
         # 绑定关闭窗口事件
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
@@ -115,6 +145,8 @@ class MainWindow:
                         self.output_dir.set(config['output_dir'])
                     if config.get('template_dir'):
                         self.template_dir.set(config['template_dir'])
+                    if config.get('preview_file'):
+                        self.preview_file.set(config['preview_file'])
         except Exception as e:
             print(f"加载配置文件失败: {str(e)}")
 
@@ -124,7 +156,8 @@ class MainWindow:
             config = {
                 'input_dir': self.input_dir.get() if self.input_dir.get() != "未选择" else "",
                 'output_dir': self.output_dir.get() if self.output_dir.get() != "未选择" else "",
-                'template_dir': self.template_dir.get() if self.template_dir.get() != "未选择" else ""
+                'template_dir': self.template_dir.get() if self.template_dir.get() != "未选择" else "",
+                'preview_file': self.preview_file.get() if self.preview_file.get() != "未选择" else ""
             }
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(config, f, ensure_ascii=False, indent=4)
@@ -220,13 +253,48 @@ class MainWindow:
                                     command=lambda: self.log_text.delete(1.0, tk.END))
         clear_log_button.grid(row=0, column=0, sticky=(tk.W, tk.E))
         
+        # 预览框架 - 显示所选文件的转换结果
+        preview_frame = ttk.LabelFrame(main_frame, text="预览", padding="25")
+        preview_frame.grid(row=0, column=2, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(30, 0))
+        
+        # 预览文件选择
+        preview_path_frame = ttk.Frame(preview_frame, style='Card.TFrame')
+        preview_path_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        ttk.Label(preview_path_frame, textvariable=self.preview_file, wraplength=300).grid(row=0, column=0, sticky=tk.W)
+        ttk.Button(preview_path_frame, text="选择文件", style='Secondary.TButton',
+                  command=self.select_preview_file).grid(row=0, column=1, padx=(15, 0))
+        
+        # 预览文本框（只读）
+        self.preview_text = tk.Text(preview_frame, wrap=tk.WORD, width=45, height=22,
+                                   font=('SF Pro Display', 11),
+                                   bg='#ffffff',
+                                   fg='#1d1d1f',
+                                   relief='flat',
+                                   padx=15,
+                                   pady=15,
+                                   selectbackground='#0066cc',
+                                   selectforeground='#ffffff',
+                                   state=tk.DISABLED)
+        self.preview_text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        preview_scrollbar = ttk.Scrollbar(preview_frame, orient=tk.VERTICAL, command=self.preview_text.yview)
+        preview_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        self.preview_text['yscrollcommand'] = preview_scrollbar.set
+        
+        # 预览状态
+        ttk.Label(preview_frame, textvariable=self.preview_status).grid(row=2, column=0, columnspan=2, sticky=tk.W)
+        
         # 配置网格权重
         self.root.grid_rowconfigure(0, weight=1)
         self.root.grid_columnconfigure(0, weight=1)
         main_frame.columnconfigure(1, weight=3)  # 让日志区域占据更多空间
+        main_frame.columnconfigure(2, weight=3)
         main_frame.rowconfigure(0, weight=1)
         right_frame.columnconfigure(0, weight=1)
         right_frame.rowconfigure(0, weight=1)
+        preview_frame.columnconfigure(0, weight=1)
+        preview_frame.rowconfigure(1, weight=1)
+        preview_path_frame.columnconfigure(0, weight=1)
         convert_frame.columnconfigure(0, weight=1)  # 让转换按钮自适应宽度
         log_buttons_frame.columnconfigure(0, weight=1)  # 让清除日志按钮自适应宽度
         
@@ -249,6 +317,149 @@ class MainWindow:
                 self.output_dir.set(directory)
             else:  # template
                 self.template_dir.set(directory)
+            self.schedule_preview()
+
+    def select_preview_file(self):
+        filename = filedialog.askopenfilename(title="选择预览文件",
+                                              filetypes=[("Markdown", "*.md *.markdown")])
+        if filename:
+            self.preview_file.set(filename)
+            self.schedule_preview()
+
+    def on_drop(self, paths):
+        """处理拖放：文件用于预览，文件夹作为输入目录"""
+        path = paths[0]
+        if os.path.isdir(path):
+            self.input_dir.set(path)
+            self.add_log(f"已选择输入目录: {path}")
+        elif path.endswith(('.md', '.markdown')):
+            self.preview_file.set(path)
+            self.add_log(f"已选择预览文件: {path}")
+            self.schedule_preview()
+        else:
+            self.add_log(f"不支持的文件类型: {path}")
+
+    def find_template_dir(self):
+        """在模板父目录中查找第一个包含完整模板文件集的子文件夹
+        
+        Returns:
+            (模板目录, 错误信息)，找到时错误信息为None
+        """
+        template_parent_dir = self.template_dir.get()
+        
+        # 验证父目录是否存在
+        if not os.path.exists(template_parent_dir):
+            return None, f"模板父目录不存在：\n{template_parent_dir}"
+        
+        # 获取父目录下的所有子目录
+        template_subdirs = [d for d in os.listdir(template_parent_dir) 
+                          if os.path.isdir(os.path.join(template_parent_dir, d))]
+        
+        if not template_subdirs:
+            return None, "模板父目录下没有子文件夹！"
+        
+        # 在每个子目录中查找模板文件
+        for subdir in template_subdirs:
+            subdir_path = os.path.join(template_parent_dir, subdir)
+            # 检查该子目录是否包含所有必需的模板文件
+            if all(os.path.exists(os.path.join(subdir_path, f)) for f in REQUIRED_TEMPLATES):
+                return subdir_path, None
+        
+        return None, f"在子文件夹中未找到完整的模板文件集！\n需要的文件：{', '.join(REQUIRED_TEMPLATES)}"
+
+    def _watched_mtimes(self, template_dir):
+        """获取预览文件和模板文件的修改时间"""
+        paths = [self.preview_file.get()]
+        if template_dir:
+            paths += [os.path.join(template_dir, f) for f in WATCHED_TEMPLATES]
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.path.getmtime(path)
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def _poll_template_dir(self):
+        """轮询用的模板目录；只在模板父目录变化或尚未找到时重新查找"""
+        parent = self.template_dir.get()
+        if parent == "未选择":
+            return None
+        cached_parent, template_dir = self.poll_template
+        if parent != cached_parent or template_dir is None:
+            template_dir, _ = self.find_template_dir()
+            self.poll_template = (parent, template_dir)
+        return template_dir
+
+    def poll_preview_sources(self):
+        """定期检查预览文件和模板是否变化"""
+        try:
+            if self.preview_file.get() != "未选择":
+                template_dir = self._poll_template_dir()
+                observed = (template_dir, self._watched_mtimes(template_dir))
+                # 每次看到新的变化都重新计时，文件静止后才渲染
+                if observed != self.preview_observed:
+                    self.preview_observed = observed
+                    if observed != (self.preview_template_dir, self.preview_mtimes):
+                        self.schedule_preview()
+        except Exception as e:
+            print(f"检查预览文件时出错: {str(e)}")
+        self.root.after(PREVIEW_POLL_MS, self.poll_preview_sources)
+
+    def schedule_preview(self):
+        """防抖：连续的变化只触发一次重新渲染"""
+        if self.preview_job is not None:
+            self.root.after_cancel(self.preview_job)
+        self.preview_job = self.root.after(PREVIEW_DEBOUNCE_MS, self.refresh_preview)
+
+    def refresh_preview(self):
+        """重新渲染预览，只转换有改动的块"""
+        self.preview_job = None
+        preview_file = self.preview_file.get()
+        if preview_file == "未选择":
+            return
+        if self.template_dir.get() == "未选择":
+            self.preview_mtimes = self._watched_mtimes(None)
+            self.preview_status.set("请先选择模板目录")
+            return
+        
+        template_dir, error = self.find_template_dir()
+        mtimes = self._watched_mtimes(template_dir)
+        template_changed = (template_dir != self.preview_template_dir or
+                            any(mtimes.get(p) != self.preview_mtimes.get(p)
+                                for p in mtimes if p != preview_file))
+        self.preview_template_dir = template_dir
+        self.preview_mtimes = mtimes
+        if error:
+            self.preview_status.set(error.replace('\n', ' '))
+            return
+        
+        try:
+            start = time.perf_counter()
+            # 模板变化时重建转换器，并清空块缓存
+            if self.preview_renderer is None or template_changed:
+                converter = MarkdownConverter(template_dir)
+                if self.preview_renderer is None:
+                    self.preview_renderer = IncrementalRenderer(converter)
+                else:
+                    self.preview_renderer.reset(converter)
+            
+            with open(preview_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            output = self.preview_renderer.render(content)
+            elapsed = (time.perf_counter() - start) * 1000
+            
+            # 保留滚动位置
+            position = self.preview_text.yview()[0]
+            self.preview_text.configure(state=tk.NORMAL)
+            self.preview_text.delete(1.0, tk.END)
+            self.preview_text.insert(tk.END, output)
+            self.preview_text.configure(state=tk.DISABLED)
+            self.preview_text.yview_moveto(position)
+            
+            self.preview_status.set(f"已更新：重新转换 {self.preview_renderer.rendered_blocks} 个块，耗时 {elapsed:.0f} ms")
+        except Exception as e:
+            self.preview_status.set(f"预览失败：{str(e)}")
     
     def update_progress(self, current, total, filename):
         """更新进度条和进度标签"""
@@ -278,39 +489,14 @@ class MainWindow:
             return
             
         # 验证模板文件是否存在
-        required_templates = ['top.html', 'bottom.html', 'h2.html']
-        template_parent_dir = self.template_dir.get()
-        
-        # 验证父目录是否存在
-        if not os.path.exists(template_parent_dir):
-            messagebox.showwarning("警告", f"模板父目录不存在：\n{template_parent_dir}")
-            return
-        
-        # 获取父目录下的所有子目录
-        template_subdirs = [d for d in os.listdir(template_parent_dir) 
-                          if os.path.isdir(os.path.join(template_parent_dir, d))]
-        
-        if not template_subdirs:
-            messagebox.showwarning("警告", "模板父目录下没有子文件夹！")
-            return
-        
-        # 在每个子目录中查找模板文件
-        template_dir = None
-        for subdir in template_subdirs:
-            subdir_path = os.path.join(template_parent_dir, subdir)
-            # 检查该子目录是否包含所有必需的模板文件
-            if all(os.path.exists(os.path.join(subdir_path, f)) for f in required_templates):
-                template_dir = subdir_path
-                break
-        
+        template_dir, error = self.find_template_dir()
         if not template_dir:
-            messagebox.showwarning("警告", 
-                                 f"在子文件夹中未找到完整的模板文件集！\n需要的文件：{', '.join(required_templates)}")
+            messagebox.showwarning("警告", error)
             return
             
         try:
-            # 创建转换器，使用找到的模板目录
-            converter = MarkdownConverter(template_dir)
+            # 创建转换器，使用找到的模板目录；统计扩展耗时并在转换后输出到日志
+            converter = MarkdownConverter(template_dir, profile=True)
             
             # 显示进度条
             self.progress_frame.grid()
@@ -332,6 +518,7 @@ class MainWindow:
             result_message = f"转换完成！\n成功：{success_count} 个文件\n失败：{fail_count} 个文件"
             messagebox.showinfo("转换完成", result_message)
             self.add_log(result_message)
+            self.add_log(converter.extension_stats.format_report())
             
         except Exception as e:
             error_message = f"转换过程中发生错误：\n{str(e)}"
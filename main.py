@@ -1,43 +1,85 @@
 import click
 import os
 from src.converter import MarkdownConverter
+from src.work_queue import WorkQueue, run_coordinator, run_worker
 
 @click.command()
-@click.option('--input-dir', '-i', required=True, help='输入Markdown文件夹路径')
-@click.option('--output-dir', '-o', required=True, help='输出HTML文件夹路径')
-@click.option('--template-dir', '-t', required=True, help='模板文件夹路径')
-def convert(input_dir, output_dir, template_dir):
+@click.option('--input-dir', '-i', help='输入Markdown文件夹路径')
+@click.option('--output-dir', '-o', help='输出HTML文件夹路径')
+@click.option('--template-dir', '-t', help='模板文件夹路径')
+@click.option('--mode', type=click.Choice(['local', 'coordinator', 'worker']), default='local',
+              help='运行模式：本机转换、分布式协调者或分布式工作进程')
+@click.option('--queue', '-q', help='分布式模式下的工作队列文件（SQLite），多台主机需位于共享文件系统上')
+@click.option('--workers', '-w', default=0, type=int, help='协调者在本机启动的工作进程数')
+@click.option('--shard-size', default=100, type=int, help='每个分片包含的文件数')
+@click.option('--lease-seconds', default=300, type=int, help='分片租约时长（秒），过期后分片会被重新分配')
+@click.option('--fresh', is_flag=True, help='协调者丢弃队列中已有的任务，重新扫描输入目录')
+@click.option('--profile', is_flag=True, help='转换结束后输出各扩展处理器的耗时统计（协调者模式下汇总所有工作进程）')
+def convert(input_dir, output_dir, template_dir, mode, queue, workers, shard_size, lease_seconds, fresh, profile):
     """
     将指定目录下的Markdown文件转换为HTML格式的txt文件
-    
+
     示例:
     python main.py -i ./markdown文件夹 -o ./输出文件夹 -t ./模板文件夹
+
+    分布式模式:
+    python main.py --mode coordinator -q ./queue.db -w 4 -i ./markdown文件夹 -o ./输出文件夹 -t ./模板文件夹
+    python main.py --mode worker -q ./queue.db
     """
     try:
+        if mode != 'local' and not queue:
+            raise click.BadParameter("分布式模式需要指定工作队列文件 --queue")
+
+        if mode == 'worker':
+            # 队列文件可能还在由协调者创建，run_worker 会等待任务写入
+            click.echo("工作进程已启动...")
+            success_count, fail_count = run_worker(queue, lease_seconds=lease_seconds,
+                                                   log=click.echo, profile=profile)
+            click.echo(f"\n本工作进程完成! 成功: {success_count} 个文件, 失败: {fail_count} 个文件")
+            return
+
+        if not (input_dir and output_dir and template_dir):
+            raise click.BadParameter("需要指定 --input-dir、--output-dir 和 --template-dir")
+
         # 验证目录是否存在
         if not os.path.exists(input_dir):
             raise click.BadParameter(f"输入目录不存在: {input_dir}")
         if not os.path.exists(template_dir):
             raise click.BadParameter(f"模板目录不存在: {template_dir}")
-            
-        # 创建转换器
-        converter = MarkdownConverter(template_dir)
-        
+
         # 开始转换
         click.echo("开始转换...")
-        success_count, fail_count = converter.convert_directory(input_dir, output_dir)
-        
+        if mode == 'coordinator':
+            success_count, fail_count = run_coordinator(
+                queue, input_dir, output_dir, template_dir,
+                shard_size=shard_size,
+                workers=workers,
+                lease_seconds=lease_seconds,
+                progress_callback=lambda done, total: click.echo(f"已完成分片: {done}/{total}"),
+                fresh=fresh,
+                profile=profile,
+                log=click.echo
+            )
+            if profile:
+                click.echo(WorkQueue(queue).load_stats().format_report())
+        else:
+            # 创建转换器
+            converter = MarkdownConverter(template_dir, profile=profile)
+            success_count, fail_count = converter.convert_directory(input_dir, output_dir)
+            if profile:
+                click.echo(converter.extension_stats.format_report())
+
         # 输出结果
         click.echo(f"\n转换完成!")
         click.echo(f"成功: {success_count} 个文件")
         click.echo(f"失败: {fail_count} 个文件")
-        
+
         if fail_count > 0:
             click.echo("\n请检查错误信息并重试失败的文件")
-            
+
     except Exception as e:
         click.echo(f"发生错误: {str(e)}", err=True)
         raise click.Abort()
 
 if __name__ == '__main__':
-    convert() 
\ No newline at end of file
+    convert()
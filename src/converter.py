@@ -3,6 +3,7 @@ import os
 import markdown
 from markdown.inlinepatterns import SimpleTagInlineProcessor, ImageInlineProcessor
 from jinja2 import Template, FileSystemLoader, Environment
+from src.extensions import load_extension_config, apply_extensions, spans_blocks, ProcessorStats
 try:
     from markdown.util import etree
 except ImportError:
@@ -59,6 +60,8 @@ class BoldColorExtension(markdown.Extension):
         bold_pattern = BoldColorPattern(pattern, md, self.bold_color)
         md.inlinePatterns.register(bold_pattern, 'strong', 175)
 
+class ImageBreakExtension(markdown.Extension):
+    def extendMarkdown(self, md):
         # 替换默认的图片处理器
         if 'image' in md.inlinePatterns:
             del md.inlinePatterns['image']
@@ -81,7 +84,12 @@ class CustomMarkdownConverter(markdown.Markdown):
             raise
 
 class MarkdownConverter:
-    def __init__(self, template_dir):
+    def __init__(self, template_dir, profile=False):
+        """
+        Args:
+            template_dir: 模板目录
+            profile: 是否统计各扩展处理器的耗时；计时有额外开销，默认关闭
+        """
         self.template_dir = template_dir
         # 读取加粗文字颜色
         try:
@@ -90,7 +98,16 @@ class MarkdownConverter:
         except FileNotFoundError:
             bold_color = '#ff6827'  # 默认颜色
             
-        self.md = CustomMarkdownConverter(extensions=[BoldColorExtension(bold_color=bold_color)])
+        # 按模板目录中的 extensions.json 加载扩展，需要时统计各处理器耗时
+        specs = load_extension_config(template_dir)
+        for name, config in specs:
+            if name == 'boldcolor':
+                config.setdefault('bold_color', bold_color)
+        self.extension_stats = ProcessorStats() if profile else None
+        self.md = CustomMarkdownConverter()
+        apply_extensions(self.md, specs, self.extension_stats)
+        # 有跨块生效的扩展时，增量预览需要整篇转换
+        self.spans_blocks = any(spans_blocks(name) for name, _ in specs)
         self.env = Environment(loader=FileSystemLoader(template_dir))
         
         # 初始化二级标题计数器
@@ -164,6 +181,54 @@ class MarkdownConverter:
             print(f"处理标题时出错: {str(e)}")
             return content  # 返回原始内容
 
+    def _apply_h2_template(self, html_content):
+        """将HTML中的二级标题替换为h2模板，并在标题前添加空行"""
+        try:
+            # 使用正则表达式匹配二级标题的HTML标签
+            h2_pattern = re.compile(r'(?:<h2>|<section[^>]*?>\s*<section[^>]*?>\s*<section[^>]*?>\s*<p>\s*<strong>)(.*?)(?:</h2>|</strong></p>\s*</section>\s*</section>\s*</section>)', re.DOTALL)
+            
+            def replace_h2(match):
+                self.h2_count += 1
+                h2_text = match.group(1).strip()
+                
+                if not self.h2_template:
+                    return f'<p class="aiActive"><br/></p>\n<h2>{h2_text}</h2>'
+                
+                template = self.h2_template.replace('\n', '').strip()
+                result = template.replace('{h2_text}', h2_text).replace('{h2_count}', str(self.h2_count))
+                return f'<p class="aiActive"><br/></p>\n{result}'
+            
+            # 重置计数器
+            self.h2_count = 0
+            html_content = h2_pattern.sub(replace_h2, html_content)
+            
+        except Exception as e:
+            print(f"处理标题时出错: {str(e)}")
+        return html_content
+
+    def render_html(self, html_content):
+        """对已转换的HTML应用标题模板，并拼接顶部和底部模板"""
+        html_content = self._apply_h2_template(html_content)
+        
+        # 组合最终内容
+        try:
+            return self.top_template + html_content + self.bottom_template
+        except Exception as e:
+            print(f"组合内容时出错: {str(e)}")
+            raise
+
+    def convert_text(self, content):
+        """将markdown文本转换为最终输出内容"""
+        # 先转换markdown到HTML
+        try:
+            self.md.reset()
+            html_content = self.md.convert(content)
+        except Exception as e:
+            print(f"Markdown转换时出错: {str(e)}")
+            raise
+        
+        return self.render_html(html_content)
+
     def convert_file(self, input_file, output_file):
         """转换单个文件"""
         try:
@@ -171,42 +236,7 @@ class MarkdownConverter:
             with open(input_file, 'r', encoding='utf-8') as f:
                 content = f.read()
 
-            # 先转换markdown到HTML
-            try:
-                html_content = self.md.convert(content)
-            except Exception as e:
-                print(f"Markdown转换时出错: {str(e)}")
-                raise
-            
-            # 处理二级标题和添加空行
-            try:
-                # 使用正则表达式匹配二级标题的HTML标签
-                h2_pattern = re.compile(r'(?:<h2>|<section[^>]*?>\s*<section[^>]*?>\s*<section[^>]*?>\s*<p>\s*<strong>)(.*?)(?:</h2>|</strong></p>\s*</section>\s*</section>\s*</section>)', re.DOTALL)
-                
-                def replace_h2(match):
-                    self.h2_count += 1
-                    h2_text = match.group(1).strip()
-                    
-                    if not self.h2_template:
-                        return f'<p class="aiActive"><br/></p>\n<h2>{h2_text}</h2>'
-                    
-                    template = self.h2_template.replace('\n', '').strip()
-                    result = template.replace('{h2_text}', h2_text).replace('{h2_count}', str(self.h2_count))
-                    return f'<p class="aiActive"><br/></p>\n{result}'
-                
-                # 重置计数器
-                self.h2_count = 0
-                html_content = h2_pattern.sub(replace_h2, html_content)
-                
-            except Exception as e:
-                print(f"处理标题时出错: {str(e)}")
-            
-            # 组合最终内容
-            try:
-                final_content = self.top_template + html_content + self.bottom_template
-            except Exception as e:
-                print(f"组合内容时出错: {str(e)}")
-                raise
+            final_content = self.convert_text(content)
             
             # 保存为txt文件
             try:
@@ -221,6 +251,16 @@ class MarkdownConverter:
             print(f"转换文件 {input_file} 时出错: {str(e)}")
             return False
 
+    @staticmethod
+    def find_markdown_files(input_dir):
+        """获取目录下所有要处理的markdown文件名"""
+        return [f for f in os.listdir(input_dir) if f.endswith(('.md', '.markdown'))]
+
+    @staticmethod
+    def output_path_for(output_dir, filename):
+        """获取markdown文件对应的输出文件路径"""
+        return os.path.join(output_dir, os.path.splitext(filename)[0] + '.txt')
+
     def convert_directory(self, input_dir, output_dir, progress_callback=None):
         """转换整个目录下的markdown文件
         
@@ -236,13 +276,12 @@ class MarkdownConverter:
         fail_count = 0
         
         # 获取所有要处理的文件
-        md_files = [f for f in os.listdir(input_dir) if f.endswith(('.md', '.markdown'))]
+        md_files = self.find_markdown_files(input_dir)
         total_files = len(md_files)
         
         for index, filename in enumerate(md_files, 1):
             input_path = os.path.join(input_dir, filename)
-            output_path = os.path.join(output_dir, 
-                                     os.path.splitext(filename)[0] + '.txt')
+            output_path = self.output_path_for(output_dir, filename)
             
             if self.convert_file(input_path, output_path):
                 success_count += 1
@@ -252,4 +291,132 @@ class MarkdownConverter:
             if progress_callback:
                 progress_callback(index, total_files, filename)
         
-        return success_count, fail_count 
\ No newline at end of file
+        return success_count, fail_count 
+
+class IncrementalRenderer:
+    """按块缓存转换结果的渲染器，用于预览时只重新转换有改动的块"""
+
+    # 引用式链接定义以及状态跨块生效的扩展，出现时退回整篇转换
+    REFERENCE_RE = re.compile(r'^ {0,3}\[[^\]]+\]:', re.MULTILINE)
+    LIST_RE = re.compile(r'^ {0,3}(?:[*+-]|\d+\.)\s')
+    FENCE_RE = re.compile(r'^ {0,3}(?:```|~~~)')
+    QUOTE_RE = re.compile(r'^ {0,3}>', re.MULTILINE)
+    HTML_START_RE = re.compile(r'^ {0,3}<([a-zA-Z][a-zA-Z0-9-]*)')
+    # 不需要闭合标签的块级元素
+    VOID_TAGS = {'hr'}
+    # 追加在每个块后的哨兵段落，用于保留块与下一个块之间的分隔符
+    SENTINEL = 'wzxincrementalsentinelwzx'
+
+    def __init__(self, converter):
+        self.converter = converter
+        self._cache = {}
+        self.rendered_blocks = 0
+
+    def reset(self, converter=None):
+        """清空缓存；模板变化时可同时替换转换器"""
+        if converter is not None:
+            self.converter = converter
+        self._cache = {}
+
+    def split_blocks(self, content):
+        """按空行将markdown切分为可独立转换的块
+
+        围栏代码块内的空行不切分；缩进的行（代码块、列表续行）、相邻的
+        列表块和引用块会并入前一个块，原始HTML块会一直合并到闭合标签为止，
+        保证每个块单独转换的结果与整篇转换一致。
+        """
+        blocks = []
+        current = []
+        in_fence = False
+        for line in content.split('\n'):
+            if self.FENCE_RE.match(line):
+                in_fence = not in_fence
+            if line.strip() or in_fence:
+                current.append(line)
+                continue
+            if current:
+                blocks.append('\n'.join(current))
+                current = []
+        if current:
+            blocks.append('\n'.join(current))
+
+        merged = []
+        # 尚未闭合的原始HTML块：(标签名, 未闭合的层数)，注释的标签名为None
+        open_html = None
+        # 上一个块是否结束在列表中（列表项或其缩进的续行）
+        in_list = False
+        for block in blocks:
+            is_list = bool(self.LIST_RE.match(block))
+            if merged and (open_html or block[0] in ' \t' or
+                           (is_list and in_list) or
+                           (self.QUOTE_RE.match(block) and self.QUOTE_RE.search(merged[-1]))):
+                merged[-1] = merged[-1] + '\n\n' + block
+                in_list = is_list or (in_list and block[0] in ' \t')
+            else:
+                merged.append(block)
+                in_list = is_list
+                open_html = self._html_start(block)
+                if open_html is None:
+                    continue
+            if open_html:
+                open_html = self._html_remaining(open_html, block)
+        return merged
+
+    def _html_start(self, block):
+        """块以原始HTML开头时返回 (标签名, 0)，否则返回None"""
+        if block.lstrip().startswith('<!--'):
+            return (None, 0)
+        match = self.HTML_START_RE.match(block)
+        if match:
+            tag = match.group(1).lower()
+            if tag not in self.VOID_TAGS and self.converter.md.is_block_level(tag):
+                return (tag, 0)
+        return None
+
+    def _html_remaining(self, open_html, block):
+        """计入一个块后仍未闭合的原始HTML；已闭合时返回None"""
+        tag, depth = open_html
+        if tag is None:
+            return None if '-->' in block else open_html
+        depth += len(re.findall(rf'<{tag}\b', block, re.IGNORECASE))
+        depth -= len(re.findall(rf'</{tag}\s*>', block, re.IGNORECASE))
+        return (tag, depth) if depth > 0 else None
+
+    def render(self, content):
+        """转换markdown文本，返回最终输出内容"""
+        self.rendered_blocks = 0
+        if self.converter.spans_blocks or self.REFERENCE_RE.search(content):
+            self._cache = {}
+            self.rendered_blocks = 1
+            return self.converter.convert_text(content)
+
+        cache = {}
+        parts = []
+        for block in self.split_blocks(content):
+            html = cache.get(block)
+            if html is None:
+                html = self._cache.get(block)
+            if html is None:
+                html = self._convert_block(block)
+                self.rendered_blocks += 1
+            if html is None:
+                # 块无法安全地单独转换，退回整篇转换
+                self._cache = {}
+                self.rendered_blocks = 1
+                return self.converter.convert_text(content)
+            cache[block] = html
+            parts.append(html)
+        # 只保留当前文档中仍然存在的块
+        self._cache = cache
+        # 与 markdown 一样去掉首尾空白
+        return self.converter.render_html(''.join(parts).strip())
+
+    def _convert_block(self, block):
+        """转换单个块，返回的HTML带有与下一个块之间的分隔符；无法安全转换时返回None"""
+        md = self.converter.md
+        md.reset()
+        html = md.convert(block + '\n\n' + self.SENTINEL)
+        suffix = f'<p>{self.SENTINEL}</p>'
+        if not html.endswith(suffix):
+            return None
+        return html[:-len(suffix)]
@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import importlib
+
+# 模板目录中的扩展配置文件
+CONFIG_FILE = 'extensions.json'
+
+# 可用扩展：名称 -> '模块路径:类名'，只在被选用时才导入
+EXTENSIONS = {
+    'boldcolor': 'src.converter:BoldColorExtension',
+    'image_break': 'src.converter:ImageBreakExtension',
+    'tables': 'markdown.extensions.tables:TableExtension',
+    'fenced_code': 'markdown.extensions.fenced_code:FencedCodeExtension',
+    'footnotes': 'markdown.extensions.footnotes:FootnoteExtension',
+    'codehilite': 'markdown.extensions.codehilite:CodeHiliteExtension',
+    'toc': 'markdown.extensions.toc:TocExtension',
+    'attr_list': 'markdown.extensions.attr_list:AttrListExtension',
+    'def_list': 'markdown.extensions.def_list:DefListExtension',
+    'abbr': 'markdown.extensions.abbr:AbbrExtension',
+    'sane_lists': 'markdown.extensions.sane_lists:SaneListExtension',
+    'nl2br': 'markdown.extensions.nl2br:Nl2BrExtension',
+}
+
+# 状态跨块生效的扩展（目录和唯一标题ID、缩写定义、脚注、跨空行的定义列表），
+# 增量预览不能逐块转换，只能整篇转换
+DOCUMENT_EXTENSIONS = {'toc', 'abbr', 'footnotes', 'def_list'}
+
+# 没有配置文件时使用的扩展，与原有的转换效果一致
+DEFAULT_EXTENSIONS = ['boldcolor', 'image_break']
+
+# 统计耗时的处理器类型及需要计时的方法
+PROCESSOR_METHODS = {
+    'pre': ('run',),
+    'block': ('test', 'run'),
+    'tree': ('run',),
+    'inline': ('handleMatch',),
+    'post': ('run',),
+}
+
+def register_extension(name, path, document=False):
+    """注册扩展，path 格式为 '模块路径:类名'
+
+    Args:
+        document: 扩展的状态是否跨块生效（如需要看到整篇文档才能生成的目录）
+    """
+    EXTENSIONS[name] = path
+    if document:
+        DOCUMENT_EXTENSIONS.add(name)
+    else:
+        DOCUMENT_EXTENSIONS.discard(name)
+
+def spans_blocks(name):
+    """扩展的状态是否跨块生效；未注册的自定义扩展无法判断，按跨块处理"""
+    return name in DOCUMENT_EXTENSIONS or name not in EXTENSIONS
+
+def load_extension_config(template_dir):
+    """读取模板目录中的扩展配置
+
+    配置文件格式：
+        {"extensions": ["boldcolor", "tables", {"name": "codehilite", "config": {"noclasses": true}}]}
+
+    Returns:
+        [(扩展名, 配置字典)]，没有配置文件时返回默认扩展
+    """
+    path = os.path.join(template_dir, CONFIG_FILE)
+    if not os.path.exists(path):
+        return [(name, {}) for name in DEFAULT_EXTENSIONS]
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f).get('extensions', DEFAULT_EXTENSIONS)
+    except (ValueError, AttributeError) as e:
+        raise Exception(f"扩展配置文件格式错误: {path}: {str(e)}")
+
+    specs = []
+    for entry in entries:
+        if isinstance(entry, str):
+            specs.append((entry, {}))
+        else:
+            specs.append((entry['name'], entry.get('config', {})))
+    return specs
+
+def create_extension(name, config):
+    """导入并创建扩展实例；名称未注册时可以直接使用 '模块路径:类名'"""
+    path = EXTENSIONS.get(name, name)
+    if ':' not in path:
+        raise Exception(f"未知的扩展: {name}")
+    module_name, class_name = path.split(':', 1)
+    try:
+        extension_class = getattr(importlib.import_module(module_name), class_name)
+    except (ImportError, AttributeError) as e:
+        raise Exception(f"加载扩展 {name} 失败: {str(e)}")
+    return extension_class(**config)
+
+def _processors(md):
+    """获取所有处理器：{(类型, 名称): 处理器}"""
+    registries = {
+        'pre': md.preprocessors,
+        'block': md.parser.blockprocessors,
+        'tree': md.treeprocessors,
+        'inline': md.inlinePatterns,
+        'post': md.postprocessors,
+    }
+    return {(kind, name): processor
+            for kind, registry in registries.items()
+            for name, processor in registry._data.items()}
+
+def apply_extensions(md, specs, stats=None):
+    """按顺序加载扩展，记录每个处理器来自哪个扩展，并为所有处理器加上计时
+
+    Args:
+        md: markdown.Markdown 实例
+        specs: [(扩展名, 配置字典)]
+        stats: ProcessorStats 实例，为None时不计时
+
+    Returns:
+        {(类型, 处理器名): 扩展名}，内置处理器为 'core'
+    """
+    owners = {key: 'core' for key in _processors(md)}
+    for name, config in specs:
+        before = _processors(md)
+        md.registerExtensions([create_extension(name, config)], {})
+        for key, processor in _processors(md).items():
+            # 新增的或被替换的处理器都归属当前扩展
+            if before.get(key) is not processor:
+                owners[key] = name
+
+    if stats is not None:
+        stats.instrument(md, owners)
+    return owners
+
+class ProcessorStats:
+    """累计每个处理器的耗时和调用次数"""
+
+    def __init__(self):
+        # {(扩展名, 类型, 处理器名, 方法名): [累计秒数, 调用次数]}
+        self.records = {}
+
+    def _timed(self, key, method):
+        record = self.records.setdefault(key, [0.0, 0])
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record[0] += time.perf_counter() - start
+                record[1] += 1
+        wrapper._timed = True
+        return wrapper
+
+    def instrument(self, md, owners):
+        """替换处理器实例上的方法为计时版本"""
+        for (kind, name), processor in _processors(md).items():
+            owner = owners.get((kind, name), 'core')
+            for method_name in PROCESSOR_METHODS[kind]:
+                method = getattr(processor, method_name, None)
+                if method is None or getattr(method, '_timed', False):
+                    continue
+                # 块处理器的 test 和 run 分开统计，调用次数才有意义
+                key = (owner, kind, name, method_name)
+                setattr(processor, method_name, self._timed(key, method))
+
+    def reset(self):
+        for record in self.records.values():
+            record[0] = 0.0
+            record[1] = 0
+
+    def dump(self):
+        """导出为可JSON序列化的列表：[[扩展名, 类型, 处理器名, 方法名, 累计秒数, 调用次数]]"""
+        return [list(key) + record for key, record in self.records.items()]
+
+    def merge(self, rows):
+        """合并 dump() 导出的统计，用于汇总多个工作进程的耗时"""
+        for owner, kind, name, method, seconds, calls in rows:
+            record = self.records.setdefault((owner, kind, name, method), [0.0, 0])
+            record[0] += seconds
+            record[1] += calls
+
+    def self_times(self):
+        """各处理器自身的耗时：{键: 累计秒数}
+
+        行内处理器在 tree:inline 中被调用，其耗时从 tree:inline 中扣除，
+        计入注册它的扩展，避免重复计算。
+        """
+        times = {key: record[0] for key, record in self.records.items()}
+        inline_seconds = sum(seconds for key, seconds in times.items() if key[1] == 'inline')
+        for key in times:
+            if key[1:3] == ('tree', 'inline'):
+                times[key] = max(times[key] - inline_seconds, 0.0)
+        return times
+
+    def by_extension(self):
+        """按扩展汇总耗时：{扩展名: 累计秒数}"""
+        totals = {}
+        for key, seconds in self.self_times().items():
+            totals[key[0]] = totals.get(key[0], 0.0) + seconds
+        return totals
+
+    def format_report(self):
+        """生成耗时报告，按扩展和处理器耗时降序排列"""
+        lines = ["扩展耗时统计（tree:inline 不含各行内处理器的耗时）:"]
+        totals = self.by_extension()
+        times = self.self_times()
+        owners = sorted({key[0] for key in self.records}, key=lambda o: -totals.get(o, 0.0))
+        for owner in owners:
+            lines.append(f"  {owner}: {totals.get(owner, 0.0) * 1000:.1f} ms")
+            records = sorted(((kind, name, method, times[(o, kind, name, method)], calls)
+                              for (o, kind, name, method), (seconds, calls) in self.records.items()
+                              if o == owner and calls),
+                             key=lambda r: -r[3])
+            for kind, name, method, seconds, calls in records:
+                # 只有一个计时方法的处理器不显示方法名
+                label = f"{kind}:{name}" if len(PROCESSOR_METHODS[kind]) == 1 else f"{kind}:{name}.{method}"
+                lines.append(f"    {label}  {seconds * 1000:.1f} ms（{calls} 次）")
+        return '\n'.join(lines)
@@ -1,38 +1,53 @@
 import tkinter as tk
 
-def add_drag_n_drop_support(widget):
-    """为tkinter窗口添加拖放支持"""
-    
-    def _drag_enter(event):
-        event.widget.focus_force()
-        return event.action
-    
-    def _drag_leave(event):
-        return event.action
-    
-    def _drop_position(event):
-        return event.action
-    
-    widget.drop_target_register = lambda *args: None
-    widget.dnd_bind = lambda *args: None
-    
+# tkdnd中表示文件列表的数据类型
+DND_FILES = 'DND_Files'
+
+def _load_tkdnd(widget):
+    """加载tkdnd扩展，优先使用tkinterdnd2自带的二进制库"""
+    try:
+        from tkinterdnd2 import TkinterDnD
+        TkinterDnD._require(widget)
+        return True
+    except (ImportError, RuntimeError, tk.TclError):
+        pass
+
     try:
-        widget.tk.eval('package require tkdnd')
-        widget.drop_target_register = widget.tk.eval
-        
-        widget.dnd_bind = lambda event, callback: widget.bind(
-            '<<' + event + '>>', callback
-        )
-        
-        widget.tk.eval('''
-        proc ::dnd::HandleXdndEnter {window drag_source typelist} {
-            return "copy"
-        }
-        ''')
-        
-        widget.bind('<FocusIn>', _drag_enter)
-        widget.bind('<FocusOut>', _drag_leave)
-        widget.bind('<B1-Motion>', _drop_position)
-        
+        widget.tk.call('package', 'require', 'tkdnd')
+        return True
     except tk.TclError:
-        print("TkDND not available - drag and drop support disabled") 
\ No newline at end of file
+        return False
+
+def add_drag_n_drop_support(widget, on_drop):
+    """为tkinter控件添加文件拖放支持
+
+    Args:
+        widget: 接收拖放的控件
+        on_drop: 拖放回调函数，接收参数：(路径列表)
+
+    Returns:
+        是否成功启用拖放
+    """
+    if not _load_tkdnd(widget):
+        print("TkDND not available - drag and drop support disabled")
+        return False
+
+    def _drop(data):
+        try:
+            paths = list(widget.tk.splitlist(data))
+            if paths:
+                on_drop(paths)
+        except Exception as e:
+            print(f"处理拖放时出错: {str(e)}")
+        # 告知拖放源执行的是复制操作
+        return 'copy'
+
+    try:
+        widget.tk.call('tkdnd::drop_target', 'register', widget._w, (DND_FILES,))
+        # tkinter的bind不支持%D替换，这里直接使用Tcl的bind
+        command = widget._register(_drop)
+        widget.tk.call('bind', widget._w, '<<Drop>>', f'{command} %D')
+        return True
+    except tk.TclError as e:
+        print(f"注册拖放目标失败: {str(e)}")
+        return False
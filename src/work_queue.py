@@ -0,0 +1,402 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import multiprocessing
+from src.converter import MarkdownConverter
+from src.extensions import ProcessorStats
+
+# 分片状态
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS job (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    files TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    success_count INTEGER NOT NULL DEFAULT 0,
+    fail_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS shards_status ON shards (status, lease_expires);
+CREATE TABLE IF NOT EXISTS stats (
+    worker TEXT PRIMARY KEY,
+    records TEXT NOT NULL
+);
+'''
+
+class WorkQueue:
+    """基于SQLite文件的持久化工作队列
+
+    协调者把文件列表切分成分片写入队列，任意数量的工作进程（可以在
+    共享文件系统的多台主机上）领取分片并提交结果。领取分片时会设置
+    租约，工作进程失联后租约过期，分片会被重新分配。
+    """
+
+    def __init__(self, path, timeout=30, max_attempts=3):
+        self.path = path
+        self.timeout = timeout
+        # 同一分片被领取超过该次数仍未完成时，视为失败，避免反复拖垮工作进程
+        self.max_attempts = max_attempts
+
+    def _connect(self):
+        # isolation_level=None：由我们显式控制事务
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create(self, input_dir, output_dir, template_dir, files, shard_size=100, fresh=False, profile=False):
+        """创建队列并写入分片
+
+        队列中已有同一任务且还有未完成的分片时直接复用（继续处理）；任务已全部
+        完成时报错，避免重复运行时什么都不做却报告成功。
+
+        Args:
+            fresh: 丢弃队列中已有的任务和结果，按当前文件列表重新创建
+            profile: 要求工作进程统计扩展耗时并写入队列
+
+        Returns:
+            是否新写入了分片；False 表示继续处理已有的任务
+        """
+        job = {
+            'input_dir': os.path.abspath(input_dir),
+            'output_dir': os.path.abspath(output_dir),
+            'template_dir': os.path.abspath(template_dir),
+        }
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+            conn.execute('BEGIN IMMEDIATE')
+            existing = {row['key']: row['value'] for row in conn.execute('SELECT key, value FROM job')}
+            if existing and not fresh:
+                open_count = conn.execute('SELECT COUNT(*) FROM shards WHERE status IN (?, ?)',
+                                          (PENDING, LEASED)).fetchone()[0]
+                if {key: existing.get(key) for key in job} != job:
+                    conn.execute('ROLLBACK')
+                    raise Exception(f"队列文件已被其他任务使用: {self.path}")
+                if not open_count:
+                    conn.execute('ROLLBACK')
+                    raise Exception(f"队列中的任务已全部完成: {self.path}；"
+                                    f"如需重新转换请使用 --fresh，或指定新的队列文件")
+                # 继续处理时沿用本次是否统计耗时的设置
+                conn.execute('INSERT OR REPLACE INTO job (key, value) VALUES (?, ?)',
+                             ('profile', '1' if profile else '0'))
+                conn.execute('COMMIT')
+                return False
+
+            for table in ('job', 'shards', 'stats'):
+                conn.execute(f'DELETE FROM {table}')
+            conn.executemany('INSERT INTO job (key, value) VALUES (?, ?)',
+                             list(job.items()) + [('profile', '1' if profile else '0')])
+            conn.executemany(
+                'INSERT INTO shards (files) VALUES (?)',
+                ((json.dumps(files[i:i + shard_size], ensure_ascii=False),)
+                 for i in range(0, len(files), shard_size))
+            )
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def get_job(self):
+        """读取任务参数：输入目录、输出目录、模板目录"""
+        conn = self._connect()
+        try:
+            return {row['key']: row['value'] for row in conn.execute('SELECT key, value FROM job')}
+        finally:
+            conn.close()
+
+    def wait_for_job(self, timeout=60, poll_interval=1.0):
+        """等待协调者写入任务；协调者可能还在创建队列
+
+        Returns:
+            任务参数，见 get_job()
+        """
+        deadline = time.time() + timeout
+        while True:
+            if os.path.exists(self.path):
+                try:
+                    job = self.get_job()
+                    if job:
+                        return job
+                except sqlite3.OperationalError:
+                    # 队列文件刚创建，表还不存在
+                    pass
+            if time.time() >= deadline:
+                raise Exception(f"等待 {timeout} 秒后工作队列中仍没有任务: {self.path}")
+            time.sleep(poll_interval)
+
+    def claim(self, worker_id, lease_seconds):
+        """领取一个待处理或租约已过期的分片
+
+        Returns:
+            (分片ID, 文件名列表)，没有可领取的分片时返回None
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            self._fail_exhausted(conn, now)
+
+            row = conn.execute(
+                'SELECT id, files FROM shards WHERE status = ? OR (status = ? AND lease_expires < ?) '
+                'ORDER BY id LIMIT 1', (PENDING, LEASED, now)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+
+            conn.execute('UPDATE shards SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 '
+                         'WHERE id = ?', (LEASED, worker_id, now + lease_seconds, row['id']))
+            conn.execute('COMMIT')
+            return row['id'], json.loads(row['files'])
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _fail_exhausted(self, conn, now):
+        """多次领取仍未完成且租约已过期的分片直接判为失败，需在事务中调用"""
+        for row in conn.execute(
+                'SELECT id, files FROM shards WHERE status = ? AND lease_expires < ? AND attempts >= ?',
+                (LEASED, now, self.max_attempts)).fetchall():
+            conn.execute('UPDATE shards SET status = ?, worker = NULL, success_count = 0, fail_count = ? '
+                         'WHERE id = ?', (FAILED, len(json.loads(row['files'])), row['id']))
+
+    def expire_leases(self):
+        """清理已过期且领取次数用尽的租约；没有工作进程再领取分片时由协调者调用"""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            self._fail_exhausted(conn, time.time())
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def renew(self, shard_id, worker_id, lease_seconds):
+        """续租；租约已被其他工作进程接管时返回False"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'UPDATE shards SET lease_expires = ? WHERE id = ? AND worker = ? AND status = ?',
+                (time.time() + lease_seconds, shard_id, worker_id, LEASED))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, shard_id, worker_id, success_count, fail_count):
+        """提交分片结果；租约已被其他工作进程接管时返回False"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'UPDATE shards SET status = ?, success_count = ?, fail_count = ?, lease_expires = NULL '
+                'WHERE id = ? AND worker = ? AND status = ?',
+                (DONE, success_count, fail_count, shard_id, worker_id, LEASED))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def save_stats(self, worker_id, records):
+        """保存工作进程累计的扩展耗时统计，records 为 ProcessorStats.dump() 的结果"""
+        conn = self._connect()
+        try:
+            conn.execute('INSERT OR REPLACE INTO stats (worker, records) VALUES (?, ?)',
+                         (worker_id, json.dumps(records, ensure_ascii=False)))
+        finally:
+            conn.close()
+
+    def load_stats(self):
+        """合并所有工作进程的扩展耗时统计
+
+        Returns:
+            ProcessorStats 实例
+        """
+        stats = ProcessorStats()
+        conn = self._connect()
+        try:
+            for row in conn.execute('SELECT records FROM stats'):
+                stats.merge(json.loads(row['records']))
+        finally:
+            conn.close()
+        return stats
+
+    def summary(self):
+        """汇总结果
+
+        Returns:
+            字典：各状态的分片数、成功和失败的文件数
+        """
+        conn = self._connect()
+        try:
+            result = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+            for row in conn.execute('SELECT status, COUNT(*) AS n FROM shards GROUP BY status'):
+                result[row['status']] = row['n']
+            row = conn.execute('SELECT COALESCE(SUM(success_count), 0) AS s, '
+                               'COALESCE(SUM(fail_count), 0) AS f FROM shards').fetchone()
+            result['success'] = row['s']
+            result['fail'] = row['f']
+            return result
+        finally:
+            conn.close()
+
+    def is_finished(self):
+        """所有分片都已完成或失败"""
+        summary = self.summary()
+        return summary[PENDING] == 0 and summary[LEASED] == 0
+
+
+def default_worker_id():
+    """主机名加进程号，保证多台主机上的工作进程ID不冲突"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def run_worker(queue_path, worker_id=None, lease_seconds=300, poll_interval=1.0, log=print, profile=False,
+               job_timeout=60):
+    """工作进程：循环领取分片并转换，直到队列中所有分片都处理完毕
+
+    Args:
+        profile: 统计扩展耗时，结束时输出本进程的统计；协调者要求统计时也会写入队列
+        job_timeout: 等待协调者写入任务的最长时间（秒）
+
+    Returns:
+        (本进程成功数, 本进程失败数)
+    """
+    queue = WorkQueue(queue_path)
+    worker_id = worker_id or default_worker_id()
+    job = queue.wait_for_job(job_timeout, poll_interval)
+    # 只有需要时才统计耗时，计时本身有开销
+    collect_stats = profile or job.get('profile') == '1'
+    converter = MarkdownConverter(job['template_dir'], profile=collect_stats)
+    if not os.path.exists(job['output_dir']):
+        os.makedirs(job['output_dir'], exist_ok=True)
+
+    total_success = 0
+    total_fail = 0
+    while True:
+        claimed = queue.claim(worker_id, lease_seconds)
+        if claimed is None:
+            if queue.is_finished():
+                break
+            # 其他工作进程还持有租约，等待其完成或过期
+            time.sleep(poll_interval)
+            continue
+
+        shard_id, files = claimed
+        success_count = 0
+        fail_count = 0
+        lost = False
+        # 租约剩余不到一半时才续租，避免每个文件都对共享的队列文件加写锁
+        renew_at = time.monotonic() + lease_seconds / 2
+        for filename in files:
+            input_path = os.path.join(job['input_dir'], filename)
+            output_path = MarkdownConverter.output_path_for(job['output_dir'], filename)
+            if converter.convert_file(input_path, output_path):
+                success_count += 1
+            else:
+                fail_count += 1
+            if time.monotonic() >= renew_at:
+                # 续租失败说明分片已被重新分配
+                if not queue.renew(shard_id, worker_id, lease_seconds):
+                    lost = True
+                    break
+                renew_at = time.monotonic() + lease_seconds / 2
+
+        if lost or not queue.complete(shard_id, worker_id, success_count, fail_count):
+            log(f"[{worker_id}] 分片 {shard_id} 的租约已过期，结果已丢弃")
+            continue
+
+        total_success += success_count
+        total_fail += fail_count
+        if collect_stats:
+            # 保存累计耗时，供协调者汇总
+            queue.save_stats(worker_id, converter.extension_stats.dump())
+        log(f"[{worker_id}] 完成分片 {shard_id}: 成功 {success_count}，失败 {fail_count}")
+
+    if profile:
+        log(converter.extension_stats.format_report())
+    return total_success, total_fail
+
+
+def _worker_process(queue_path, lease_seconds, poll_interval):
+    run_worker(queue_path, lease_seconds=lease_seconds, poll_interval=poll_interval)
+
+
+def run_coordinator(queue_path, input_dir, output_dir, template_dir, shard_size=100,
+                    workers=0, lease_seconds=300, poll_interval=1.0, progress_callback=None,
+                    fresh=False, profile=False, log=print):
+    """协调者：把文件列表切分写入队列，可选地启动本机工作进程，等待所有分片完成并汇总
+
+    Args:
+        workers: 在本机启动的工作进程数，为0时只等待其他主机上的工作进程
+        progress_callback: 进度回调函数，接收参数：(已结束的分片数, 总分片数)
+        fresh: 丢弃队列中已有的任务，重新扫描输入目录并创建分片
+        profile: 要求所有工作进程（包括其他主机上的）统计扩展耗时，可用 WorkQueue.load_stats() 汇总
+
+    Returns:
+        (成功数, 失败数)
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    # 启动工作进程前先检查模板集，模板有误时立即失败
+    MarkdownConverter(template_dir)
+
+    queue = WorkQueue(queue_path)
+    files = MarkdownConverter.find_markdown_files(input_dir)
+    if queue.create(input_dir, output_dir, template_dir, files, shard_size, fresh=fresh, profile=profile):
+        log(f"已创建工作队列: {len(files)} 个文件")
+    else:
+        # 继续处理中断的任务，分片沿用上次扫描的文件列表
+        log(f"继续处理队列中未完成的任务: {queue_path}")
+
+    processes = []
+    for _ in range(workers):
+        process = multiprocessing.Process(target=_worker_process,
+                                          args=(queue_path, lease_seconds, poll_interval))
+        process.start()
+        processes.append(process)
+
+    try:
+        last_finished = None
+        while True:
+            # 工作进程全部失联时不会再有人调用 claim()，由协调者清理用尽的租约
+            queue.expire_leases()
+            # 先记录本机工作进程是否都已退出，再读取进度，避免把刚完成的工作误判为未完成
+            all_exited = bool(processes) and not any(p.is_alive() for p in processes)
+            summary = queue.summary()
+            finished = summary[DONE] + summary[FAILED]
+            total = finished + summary[PENDING] + summary[LEASED]
+            if progress_callback and finished != last_finished:
+                progress_callback(finished, total)
+                last_finished = finished
+            if finished == total:
+                break
+            if all_exited:
+                raise Exception(f"本机工作进程已全部退出，仍有 {total - finished} 个分片未完成；"
+                                f"重新运行协调者可继续处理")
+            time.sleep(poll_interval)
+    finally:
+        for process in processes:
+            process.join()
+
+    summary = queue.summary()
+    return summary['success'], summary['fail']
@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+from src.converter import CustomMarkdownConverter, MarkdownConverter
+from src.extensions import (CONFIG_FILE, DEFAULT_EXTENSIONS, load_extension_config,
+                            apply_extensions, ProcessorStats)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def template_dir(tmp_path):
+    for name in ('top.html', 'bottom.html', 'h2.html'):
+        (tmp_path / name).write_text('', encoding='utf-8')
+    return tmp_path
+
+
+def test_config_defaults_when_file_missing(template_dir):
+    assert load_extension_config(str(template_dir)) == [(name, {}) for name in DEFAULT_EXTENSIONS]
+
+
+def test_config_accepts_string_and_dict_entries(template_dir):
+    config = {'extensions': ['tables', {'name': 'codehilite', 'config': {'noclasses': True}}, {'name': 'toc'}]}
+    (template_dir / CONFIG_FILE).write_text(json.dumps(config), encoding='utf-8')
+    assert load_extension_config(str(template_dir)) == [
+        ('tables', {}), ('codehilite', {'noclasses': True}), ('toc', {})]
+
+
+def test_config_rejects_malformed_json(template_dir):
+    (template_dir / CONFIG_FILE).write_text('{"extensions": [', encoding='utf-8')
+    with pytest.raises(Exception, match='格式错误'):
+        load_extension_config(str(template_dir))
+
+
+def test_unselected_extensions_are_not_imported(template_dir):
+    (template_dir / CONFIG_FILE).write_text(json.dumps({'extensions': ['tables']}), encoding='utf-8')
+    # 在新的解释器中检查，避免其他测试已导入的模块干扰
+    code = (
+        "import sys\n"
+        "from src.converter import MarkdownConverter\n"
+        f"MarkdownConverter({str(template_dir)!r})\n"
+        "print('markdown.extensions.tables' in sys.modules, 'markdown.extensions.codehilite' in sys.modules)\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ['True', 'False']
+
+
+def test_replaced_core_processor_is_owned_by_extension():
+    md = CustomMarkdownConverter()
+    owners = apply_extensions(md, [('boldcolor', {}), ('tables', {})])
+    assert owners[('inline', 'strong')] == 'boldcolor'
+    assert owners[('inline', 'em_strong')] == 'core'
+    assert owners[('block', 'table')] == 'tables'
+    assert owners[('block', 'paragraph')] == 'core'
+
+
+def test_inline_time_is_credited_to_its_extension(template_dir):
+    converter = MarkdownConverter(str(template_dir), profile=True)
+    converter.convert_text('**bold** text')
+    stats = converter.extension_stats
+    assert stats.records[('boldcolor', 'inline', 'strong', 'handleMatch')][1] == 1
+    assert stats.by_extension()['boldcolor'] > 0
+    # 行内耗时不重复计入 core
+    total = sum(record[0] for record in stats.records.values())
+    assert sum(stats.by_extension().values()) == pytest.approx(
+        total - sum(r[0] for k, r in stats.records.items() if k[1] == 'inline'))
+
+
+def test_converter_is_not_instrumented_by_default(template_dir):
+    converter = MarkdownConverter(str(template_dir))
+    assert converter.extension_stats is None
+    assert not getattr(converter.md.parser.blockprocessors['paragraph'].run, '_timed', False)
+
+
+def test_stats_dump_merge_round_trip():
+    first = ProcessorStats()
+    first.records = {('core', 'tree', 'inline', 'run'): [0.5, 2],
+                     ('boldcolor', 'inline', 'strong', 'handleMatch'): [0.1, 3]}
+    second = ProcessorStats()
+    second.records = {('core', 'tree', 'inline', 'run'): [0.25, 1]}
+
+    merged = ProcessorStats()
+    for stats in (first, second):
+        merged.merge(json.loads(json.dumps(stats.dump())))
+    assert merged.records == {('core', 'tree', 'inline', 'run'): [0.75, 3],
+                              ('boldcolor', 'inline', 'strong', 'handleMatch'): [0.1, 3]}
+    assert merged.by_extension() == pytest.approx({'core': 0.65, 'boldcolor': 0.1})
@@ -0,0 +1,56 @@
+import json
+import pytest
+from src.converter import MarkdownConverter, IncrementalRenderer
+
+
+@pytest.fixture
+def converter(tmp_path):
+    (tmp_path / 'top.html').write_text('<top>\n', encoding='utf-8')
+    (tmp_path / 'bottom.html').write_text('\n<bottom>', encoding='utf-8')
+    (tmp_path / 'h2.html').write_text('<h2x>{h2_count}.{h2_text}</h2x>', encoding='utf-8')
+    return MarkdownConverter(str(tmp_path))
+
+
+@pytest.mark.parametrize('doc', [
+    "# Title\n\nIntro **bold** text.\n\n## One\n\ntext\n\n## Two\n\nmore",
+    "- a\n- b\n\n- c\n\n    indented\n\n1. x\n2. y",
+    "para\n\n  - nested\n\n* b",
+    "- a\n\n    continued\n\n- b",
+    "> a\n\n> b",
+    "para\n> quote\n\n> more\n\nafter",
+    "<div>\n\nhello\n\n</div>\n\n*after*",
+    "<div>\n<div>\n\ninner\n\n</div>\n\nstill raw\n\n</div>\n\n**md**",
+    "<!--\n\ncomment\n\n-->\n\ntext",
+    "<hr>\n\n*after*",
+    "<div>x</div>\n\n<div>y</div>\n\ntext",
+    "text\n\n<div>\n\nunclosed\n\n*raw*",
+    "```\ncode\n\nmore\n```\n\n    indented\n\n> q",
+    "text with [ref][1]\n\n[1]: http://example.com",
+])
+def test_render_matches_batch(converter, doc):
+    renderer = IncrementalRenderer(converter)
+    assert renderer.render(doc) == converter.convert_text(doc)
+
+
+def test_render_only_reconverts_changed_blocks(converter):
+    renderer = IncrementalRenderer(converter)
+    doc = "# Title\n\nfirst\n\n> quote\n\nlast"
+    renderer.render(doc)
+    edited = doc.replace('last', 'changed')
+    assert renderer.render(edited) == converter.convert_text(edited)
+    assert renderer.rendered_blocks == 1
+
+
+@pytest.mark.parametrize('extensions, doc', [
+    (['toc'], "[TOC]\n\n# A\n\ntext\n\n# A\n\nmore"),
+    (['abbr'], "The HTML spec.\n\n*[HTML]: Hyper Text Markup Language"),
+    (['footnotes'], "Text[^1]\n\nmore\n\n[^1]: note"),
+    (['def_list'], "Term\n\n: definition"),
+])
+def test_render_matches_batch_with_document_extensions(tmp_path, extensions, doc):
+    for name in ('top.html', 'bottom.html', 'h2.html'):
+        (tmp_path / name).write_text('', encoding='utf-8')
+    (tmp_path / 'extensions.json').write_text(json.dumps({'extensions': extensions}), encoding='utf-8')
+    converter = MarkdownConverter(str(tmp_path))
+    renderer = IncrementalRenderer(converter)
+    assert renderer.render(doc) == converter.convert_text(doc)
@@ -0,0 +1,119 @@
+import os
+import pytest
+from src.converter import MarkdownConverter
+from src.work_queue import WorkQueue, run_coordinator, run_worker, DONE, FAILED
+
+
+def quiet(*args):
+    pass
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    template_dir = tmp_path / 'template'
+    input_dir = tmp_path / 'input'
+    template_dir.mkdir()
+    input_dir.mkdir()
+    (template_dir / 'top.html').write_text('<top>', encoding='utf-8')
+    (template_dir / 'bottom.html').write_text('<bottom>', encoding='utf-8')
+    (template_dir / 'h2.html').write_text('<h2x>{h2_text}</h2x>', encoding='utf-8')
+    for i in range(10):
+        (input_dir / f'f{i}.md').write_text(f'## Title {i}\n\n**bold** text', encoding='utf-8')
+    return {
+        'queue_path': str(tmp_path / 'queue.db'),
+        'input_dir': str(input_dir),
+        'output_dir': str(tmp_path / 'output'),
+        'template_dir': str(template_dir),
+    }
+
+
+def create_queue(dirs, shard_size, **kwargs):
+    queue = WorkQueue(dirs['queue_path'], **kwargs)
+    files = MarkdownConverter.find_markdown_files(dirs['input_dir'])
+    queue.create(dirs['input_dir'], dirs['output_dir'], dirs['template_dir'], files, shard_size)
+    return queue
+
+
+def coordinate(dirs, **kwargs):
+    return run_coordinator(dirs['queue_path'], dirs['input_dir'], dirs['output_dir'], dirs['template_dir'],
+                           poll_interval=0.05, log=quiet, **kwargs)
+
+
+def outputs(dirs):
+    return sorted(os.listdir(dirs['output_dir'])) if os.path.exists(dirs['output_dir']) else []
+
+
+def test_several_local_workers_finish_queue(dirs):
+    assert coordinate(dirs, shard_size=2, workers=3) == (10, 0)
+    assert len(outputs(dirs)) == 10
+    assert WorkQueue(dirs['queue_path']).summary()[DONE] == 5
+
+
+def test_abandoned_lease_is_reclaimed(dirs):
+    queue = create_queue(dirs, shard_size=5)
+    # 已过期的租约，模拟领取后崩溃的工作进程
+    assert queue.claim('dead', lease_seconds=-1) is not None
+
+    assert run_worker(dirs['queue_path'], worker_id='alive', poll_interval=0.01, log=quiet) == (10, 0)
+    assert queue.summary()[DONE] == 2
+    assert len(outputs(dirs)) == 10
+    # 已被接管的分片，原工作进程的结果会被拒绝
+    assert not queue.complete(1, 'dead', 5, 0)
+
+
+def test_exhausted_shard_is_marked_failed(dirs):
+    queue = create_queue(dirs, shard_size=100, max_attempts=1)
+    queue.claim('dead', lease_seconds=-1)
+    queue.expire_leases()
+
+    summary = queue.summary()
+    assert summary[FAILED] == 1
+    assert summary['fail'] == 10
+    assert queue.is_finished()
+
+
+def test_resume_interrupted_run(dirs):
+    queue = create_queue(dirs, shard_size=5)
+    shard_id, files = queue.claim('earlier', lease_seconds=60)
+    assert queue.complete(shard_id, 'earlier', len(files), 0)
+
+    assert coordinate(dirs, shard_size=5, workers=1) == (10, 0)
+    # 已完成的分片不会被重新处理
+    assert len(outputs(dirs)) == 5
+
+
+def test_finished_queue_is_refused_unless_fresh(dirs):
+    assert coordinate(dirs, shard_size=5, workers=1) == (10, 0)
+    with pytest.raises(Exception, match='已全部完成'):
+        coordinate(dirs, shard_size=5, workers=1)
+
+    with open(os.path.join(dirs['input_dir'], 'new.md'), 'w', encoding='utf-8') as f:
+        f.write('new')
+    assert coordinate(dirs, shard_size=5, workers=1, fresh=True) == (11, 0)
+    assert 'new.txt' in outputs(dirs)
+
+
+def test_other_job_cannot_reuse_queue(dirs, tmp_path):
+    create_queue(dirs, shard_size=5)
+    with pytest.raises(Exception, match='其他任务'):
+        WorkQueue(dirs['queue_path']).create(dirs['input_dir'], str(tmp_path / 'elsewhere'),
+                                             dirs['template_dir'], [], 5)
+
+
+def test_worker_renews_lease_only_after_half_elapsed(dirs, monkeypatch):
+    create_queue(dirs, shard_size=10)
+    calls = []
+    original = WorkQueue.renew
+
+    def renew(self, *args):
+        calls.append(args)
+        return original(self, *args)
+    monkeypatch.setattr(WorkQueue, 'renew', renew)
+
+    assert run_worker(dirs['queue_path'], lease_seconds=300, log=quiet) == (10, 0)
+    assert calls == []
+
+
+def test_worker_gives_up_without_job(tmp_path):
+    with pytest.raises(Exception, match='没有任务'):
+        run_worker(str(tmp_path / 'missing.db'), job_timeout=0.1, poll_interval=0.02, log=quiet)